@@ -11,21 +11,31 @@ from pngalpha.core import extract_alpha_two_pass
 
 def main() -> int:
     """CLI entry point."""
-    if len(sys.argv) < 4:
-        print("Usage: pngalpha <image_on_white> <image_on_black> <output_file>")
+    args = [arg for arg in sys.argv[1:] if arg != "--gpu"]
+    use_gpu = len(args) != len(sys.argv) - 1
+
+    if len(args) < 3:
+        print("Usage: pngalpha [--gpu] <image_on_white> <image_on_black> <output_file>")
         print()
         print("Creates a transparent PNG file from two images:")
         print("one on a white background and one on a black background.")
         print()
+        print("  --gpu  Run the conversion on a CUDA GPU (requires cupy)")
+        print()
         print("Example: pngalpha image_white.png image_black.png output.png")
         return 1
 
-    img_on_white_path = sys.argv[1]
-    img_on_black_path = sys.argv[2]
-    output_path = sys.argv[3]
+    img_on_white_path = args[0]
+    img_on_black_path = args[1]
+    output_path = args[2]
 
     try:
-        extract_alpha_two_pass(img_on_white_path, img_on_black_path, output_path)
+        extract_alpha_two_pass(
+            img_on_white_path,
+            img_on_black_path,
+            output_path,
+            use_gpu=use_gpu,
+        )
         print(f"Transparent PNG file created: {output_path}")
         return 0
     except Exception as e:
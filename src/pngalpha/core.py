@@ -4,65 +4,424 @@ Core image processing logic for pngalpha.
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+import functools
+
 import numpy as np
 from PIL import Image
 
+try:
+    import numba
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+try:
+    import numexpr as ne
+
+    NUMEXPR_AVAILABLE = True
+except ImportError:
+    ne = None
+    NUMEXPR_AVAILABLE = False
+
+try:
+    import pyspng
+
+    PYSPNG_AVAILABLE = True
+except ImportError:
+    pyspng = None
+    PYSPNG_AVAILABLE = False
+
+
+# Squared distance between White (255,255,255) and Black (0,0,0)
+# 255^2 + 255^2 + 255^2 = 195075, i.e. a distance of ~441.67
+BG_DIST_SQ = 3 * 255 * 255
+INV_BG_DIST_SQ = np.float32(1.0 / (3 * 255 * 255))
+
+# Below this alpha, color is too unreliable to un-premultiply.
+ALPHA_MIN = np.float32(0.01)
+HALF = np.float32(0.5)
+
+# Fixed-point scale for the integer NumPy path.
+ALPHA16_ONE = 65535
+ALPHA16_MIN = int(ALPHA_MIN * ALPHA16_ONE)
+
+# Pixels per slab in the NumPy path. The slab's ~50 bytes/pixel of
+# intermediates then fit in a typical L2/L3 slice, while slabs stay large
+# enough that per-slab Python overhead is negligible.
+BLOCK_PIXELS = 32 * 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _aligned_empty(shape: tuple[int, ...], dtype, align: int = 64) -> np.ndarray:
+    """
+    Allocate an uninitialized C-contiguous array whose data starts on an
+    ``align``-byte boundary, so SIMD code can use aligned full-width loads.
+    """
+    dtype = np.dtype(dtype)
+    nbytes = int(np.prod(shape)) * dtype.itemsize
+    buf = np.empty(nbytes + align, dtype=np.uint8)
+    offset = -buf.ctypes.data % align
+    return buf[offset : offset + nbytes].view(dtype).reshape(shape)
+
+
+@functools.lru_cache(maxsize=None)
+def _alpha_luts() -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lookup tables from squared pixel distance to alpha.
+
+    Returns:
+        (alpha16, alpha8): alpha in 16-bit fixed point (0..65535) for color
+        recovery, and alpha rounded to 8 bits for the output channel, both
+        indexed by squared distance 0..BG_DIST_SQ.
+    """
+    alpha = 1.0 - np.sqrt(np.arange(BG_DIST_SQ + 1) / BG_DIST_SQ)
+    alpha16 = np.round(alpha * ALPHA16_ONE).astype(np.uint32)
+    alpha8 = np.round(alpha * 255).astype(np.uint8)
+    return alpha16, alpha8
+
+
+def _extract_rgba_numpy(img_white: np.ndarray, img_black: np.ndarray) -> np.ndarray:
+    """
+    Pure NumPy implementation of the two-pass alpha extraction.
+
+    The image is processed in slabs of rows so that every intermediate of
+    a slab stays in cache from the distance calculation to the uint8 pack.
+
+    Args:
+        img_white: uint8 (H, W, 3) array captured on white background
+        img_black: uint8 (H, W, 3) array captured on black background
+
+    Returns:
+        uint8 (H, W, 4) RGBA array
+    """
+    height, width = img_black.shape[:2]
+    rows_per_block = max(1, BLOCK_PIXELS // max(width, 1))
+
+    output = _aligned_empty((height, width, 4), np.uint8)
+    for r0 in range(0, height, rows_per_block):
+        r1 = r0 + rows_per_block
+        _extract_block_numpy(img_white[r0:r1], img_black[r0:r1], output[r0:r1])
+    return output
+
+
+def _extract_block_numpy(
+    img_white: np.ndarray,
+    img_black: np.ndarray,
+    out_rgba: np.ndarray,
+) -> None:
+    """
+    Two-pass alpha extraction for one slab of rows.
+
+    Runs entirely in integer fixed point: the squared distance indexes a
+    precomputed alpha table, so there is no per-pixel sqrt or float math.
+
+    Args:
+        img_white: uint8 (h, W, 3) slab captured on white background
+        img_black: uint8 (h, W, 3) slab captured on black background
+        out_rgba: C-contiguous uint8 (h, W, 4) slab the RGBA result is written to
+    """
+    height, width = img_black.shape[:2]
+    alpha16_lut, alpha8_lut = _alpha_luts()
+
+    # Planar (3, H*W) copies so every channel is a contiguous 1-D stream
+    # instead of a stride-3 view into the interleaved RGB buffer.
+    white = _aligned_empty((3, height * width), np.uint8)
+    black = _aligned_empty((3, height * width), np.uint8)
+    white[...] = img_white.reshape(-1, 3).T
+    black[...] = img_black.reshape(-1, 3).T
+
+    # Calculate squared distance between corresponding observed pixels.
+    # Squares of 8-bit differences overflow int16, so accumulate in int32.
+    dr = np.subtract(white[0], black[0], dtype=np.int32)
+    dg = np.subtract(white[1], black[1], dtype=np.int32)
+    db = np.subtract(white[2], black[2], dtype=np.int32)
+
+    # Square and sum in place, reusing the difference arrays as scratch.
+    np.multiply(dr, dr, out=dr)
+    np.multiply(dg, dg, out=dg)
+    np.multiply(db, db, out=db)
+    dr += dg
+    dr += db
+    pixel_dist_sq = dr
+
+    # Opaque pixels look the same on both backgrounds; transparent do not.
+    out = out_rgba.reshape(-1, 4)
+    alpha16 = alpha16_lut[pixel_dist_sq]
+    np.take(alpha8_lut, pixel_dist_sq, out=out[:, 3])
+
+    # Avoid division by zero while un-premultiplying color. Pixels at or
+    # below the threshold are zeroed by the keep mask below, so any
+    # nonzero divisor will do for them.
+    keep = alpha16 > ALPHA16_MIN
+    alpha_safe = np.maximum(alpha16, np.uint32(1))
+
+    # Recover foreground color from image on black background:
+    # round(c / alpha) == (c * 65535 + alpha16 / 2) // alpha16
+    half = alpha_safe >> 1
+    for k in range(3):
+        # Widen explicitly: under NumPy 1.x value-based casting, uint8 times
+        # a uint32 scalar stays uint16 and c * 65535 would overflow.
+        color = np.multiply(black[k], ALPHA16_ONE, dtype=np.uint32)
+        color += half
+        color //= alpha_safe
+
+        # Zero color in near-fully transparent pixels, clamp and store
+        # straight into the interleaved output channel.
+        np.minimum(color, 255, out=color)
+        color *= keep
+        np.copyto(out[:, k], color, casting="unsafe")
+
+
+def _extract_rgba_numexpr(img_white: np.ndarray, img_black: np.ndarray) -> np.ndarray:
+    """
+    numexpr implementation of the two-pass alpha extraction.
+
+    numexpr evaluates each expression in cache-sized blocks, so the squared
+    differences and divisions never materialize as full-image temporaries.
+
+    Args:
+        img_white: float32 (H, W, 3) array captured on white background
+        img_black: float32 (H, W, 3) array captured on black background
+
+    Returns:
+        uint8 (H, W, 4) RGBA array
+    """
+    # Channel views, no copies.
+    channels = {
+        "wr": img_white[:, :, 0],
+        "wg": img_white[:, :, 1],
+        "wb": img_white[:, :, 2],
+        "br": img_black[:, :, 0],
+        "bg": img_black[:, :, 1],
+        "bb": img_black[:, :, 2],
+    }
+    alpha = ne.evaluate(
+        "1 - sqrt(((wr - br)**2 + (wg - bg)**2 + (wb - bb)**2) * inv_bg_dist_sq)",
+        local_dict={**channels, "inv_bg_dist_sq": INV_BG_DIST_SQ},
+    )
+    np.clip(alpha, 0.0, 1.0, out=alpha)
+
+    # Evaluate the near-transparent predicate once: keep is 1.0 where color
+    # is recoverable and 0.0 elsewhere, where alpha_safe becomes a + 1.
+    keep = (alpha > ALPHA_MIN).astype(np.float32)
+    alpha_safe = ne.evaluate("a + (1 - keep)", local_dict={"a": alpha, "keep": keep})
+
+    output = _aligned_empty(alpha.shape + (4,), np.uint8)
+    for k, name in enumerate(("br", "bg", "bb")):
+        # Un-premultiply color, zeroing near-fully transparent pixels.
+        # The +0.5 makes the truncating uint8 store round to nearest.
+        color = ne.evaluate(
+            "c / alpha_safe * keep + half",
+            local_dict={"c": channels[name], "alpha_safe": alpha_safe, "keep": keep, "half": HALF},
+        )
+        np.clip(color, 0, 255, out=color)
+        output[:, :, k] = color
+
+    # Alpha is already in [0, 1]; reuse its buffer for the scaled channel.
+    np.multiply(alpha, 255, out=alpha)
+    alpha += HALF
+    output[:, :, 3] = alpha
+    return output
+
+
+if NUMBA_AVAILABLE:
+
+    @numba.guvectorize(
+        [(numba.uint8[:], numba.uint8[:], numba.uint8[:])],
+        "(n),(n),(m)",
+        writable_args=("out_rgba",),
+        target="parallel",
+        nopython=True,
+        fastmath=True,
+        cache=True,
+    )
+    def _extract_kernel(rgb_white, rgb_black, out_rgba):
+        """
+        Fused alpha extraction and color recovery for a single pixel.
+
+        Broadcast over (H, W, 3) inputs and a preallocated (H, W, 4) output,
+        Numba's parallel gufunc dispatcher spreads pixels across threads and
+        writes the uint8 RGBA result in place.
+        """
+        # Exact integer squared distance; widening 8-bit differences to
+        # int32 maps onto packed multiply-add instructions.
+        dr = np.int32(rgb_white[0]) - np.int32(rgb_black[0])
+        dg = np.int32(rgb_white[1]) - np.int32(rgb_black[1])
+        db = np.int32(rgb_white[2]) - np.int32(rgb_black[2])
+        dist_sq = dr * dr + dg * dg + db * db
+
+        # Identical on both backgrounds: fully opaque, color as-is.
+        if dist_sq == 0:
+            for k in range(3):
+                out_rgba[k] = rgb_black[k]
+            out_rgba[3] = 255
+            return
+
+        # White on one, black on the other: fully transparent.
+        if dist_sq >= BG_DIST_SQ:
+            for k in range(4):
+                out_rgba[k] = 0
+            return
+
+        alpha = np.float32(1.0) - np.sqrt(np.float32(dist_sq) * INV_BG_DIST_SQ)
+        alpha = min(max(alpha, np.float32(0.0)), np.float32(1.0))
+
+        # 1.0 where color is recoverable, 0.0 for near-transparent.
+        keep = np.float32(alpha > ALPHA_MIN)
+        alpha_safe = max(alpha, ALPHA_MIN)
+
+        for k in range(3):
+            color = np.float32(rgb_black[k]) / alpha_safe * keep
+            # Branchless clamp; +0.5 then truncation rounds to nearest.
+            out_rgba[k] = np.uint8(min(np.float32(255.0), max(np.float32(0.0), color + HALF)))
+        out_rgba[3] = np.uint8(alpha * np.float32(255.0) + HALF)
+
+
+def _import_cupy():
+    """
+    Import cupy on demand, so CPU-only runs never pay for its import and
+    CUDA library probing.
+    """
+    try:
+        import cupy
+    except ImportError as exc:
+        raise RuntimeError("GPU conversion requires cupy. Install pngalpha[gpu].") from exc
+    return cupy
+
+
+@functools.lru_cache(maxsize=None)
+def _cupy_kernel():
+    """Build the fused CUDA kernel for the GPU path on first use."""
+    cp = _import_cupy()
+    return cp.ElementwiseKernel(
+        "uint8 wr, uint8 wg, uint8 wb, uint8 br, uint8 bg, uint8 bb",
+        "uint8 ro, uint8 go, uint8 bo, uint8 ao",
+        f"""
+        int dr = (int)wr - (int)br;
+        int dg = (int)wg - (int)bg;
+        int db = (int)wb - (int)bb;
+        float dist_sq = (float)(dr * dr + dg * dg + db * db);
+
+        float a = 1.0f - sqrtf(dist_sq * {float(INV_BG_DIST_SQ)!r}f);
+        a = fminf(fmaxf(a, 0.0f), 1.0f);
+        float keep = a > {float(ALPHA_MIN)!r}f ? 1.0f : 0.0f;
+        float alpha_safe = fmaxf(a, {float(ALPHA_MIN)!r}f);
+
+        ro = (unsigned char)fminf(255.0f, fmaxf(0.0f, br / alpha_safe * keep + 0.5f));
+        go = (unsigned char)fminf(255.0f, fmaxf(0.0f, bg / alpha_safe * keep + 0.5f));
+        bo = (unsigned char)fminf(255.0f, fmaxf(0.0f, bb / alpha_safe * keep + 0.5f));
+        ao = (unsigned char)(a * 255.0f + 0.5f);
+        """,
+        "pngalpha_extract",
+    )
+
+
+def _extract_rgba_cupy(img_white: np.ndarray, img_black: np.ndarray) -> np.ndarray:
+    """
+    CuPy implementation of the two-pass alpha extraction.
+
+    The whole transform is a single fused CUDA kernel launch: one read of
+    the inputs and one write of the RGBA output in device memory.
+
+    Args:
+        img_white: uint8 (H, W, 3) array captured on white background
+        img_black: uint8 (H, W, 3) array captured on black background
+
+    Returns:
+        uint8 (H, W, 4) RGBA array
+    """
+    cp = _import_cupy()
+    kernel = _cupy_kernel()
+    white = cp.asarray(img_white)
+    black = cp.asarray(img_black)
+    output = cp.empty(img_black.shape[:2] + (4,), dtype=cp.uint8)
+    kernel(
+        white[:, :, 0],
+        white[:, :, 1],
+        white[:, :, 2],
+        black[:, :, 0],
+        black[:, :, 1],
+        black[:, :, 2],
+        output[:, :, 0],
+        output[:, :, 1],
+        output[:, :, 2],
+        output[:, :, 3],
+    )
+    return cp.asnumpy(output)
+
+
+def _load_rgb(path: str) -> np.ndarray:
+    """
+    Decode an image file into a uint8 (H, W, 3) RGB array.
+
+    PNG files are decoded with libspng through pyspng when it is installed.
+    The check is on the file signature rather than the extension, since
+    images saved by generators are often JPEG data behind a .png name.
+    """
+    if PYSPNG_AVAILABLE:
+        with open(path, "rb") as f:
+            # Peek at the signature first so non-PNG files are not read
+            # into memory only to be read again by Pillow.
+            signature = f.read(len(PNG_SIGNATURE))
+            if signature == PNG_SIGNATURE:
+                return pyspng.load(signature + f.read(), format="RGB")
+    with Image.open(path) as img:
+        # convert() always copies, even when the mode already matches.
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        return np.asarray(img, dtype=np.uint8)
+
 
 def extract_alpha_two_pass(
     img_on_white_path: str,
     img_on_black_path: str,
     output_path: str,
+    use_gpu: bool = False,
 ) -> None:
     """
     Two-pass alpha extraction algorithm.
 
+    Uses a fused Numba kernel when numba is installed, then numexpr when
+    available, otherwise falls back to the pure NumPy implementation.
+
     Args:
         img_on_white_path: Path to image captured on white background
         img_on_black_path: Path to image captured on black background
         output_path: Path for output transparent PNG file
+        use_gpu: Run the conversion on a CUDA GPU through cupy
     """
-    # Load images as RGB arrays
-    img_white = np.array(Image.open(img_on_white_path).convert("RGB"), dtype=np.float64)
-    img_black = np.array(Image.open(img_on_black_path).convert("RGB"), dtype=np.float64)
+    if use_gpu:
+        # Fail before decoding anything if cupy is missing.
+        _import_cupy()
+
+    # Load images as 8-bit RGB arrays. Pillow releases the GIL while
+    # decoding, so the two files decode concurrently.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        white_future = pool.submit(_load_rgb, img_on_white_path)
+        black_future = pool.submit(_load_rgb, img_on_black_path)
+        img_white = white_future.result()
+        img_black = black_future.result()
 
     # Check dimensions match
     if img_white.shape != img_black.shape:
         raise ValueError("Dimension mismatch: Images must be identical size.")
 
-    # Distance between White (255,255,255) and Black (0,0,0)
-    # sqrt(255^2 + 255^2 + 255^2) ~= 441.67
-    bg_dist = np.sqrt(3.0 * 255 * 255)
+    if use_gpu:
+        output = _extract_rgba_cupy(img_white, img_black)
+    elif NUMBA_AVAILABLE:
+        height, width = img_black.shape[:2]
+        output = _aligned_empty((height, width, 4), np.uint8)
+        _extract_kernel(img_white, img_black, output)
+    elif NUMEXPR_AVAILABLE:
+        output = _extract_rgba_numexpr(
+            img_white.astype(np.float32),
+            img_black.astype(np.float32),
+        )
+    else:
+        output = _extract_rgba_numpy(img_white, img_black)
 
-    # Calculate distance between corresponding observed pixels
-    pixel_dist = np.sqrt(
-        (img_white[:, :, 0] - img_black[:, :, 0]) ** 2
-        + (img_white[:, :, 1] - img_black[:, :, 1]) ** 2
-        + (img_white[:, :, 2] - img_black[:, :, 2]) ** 2
-    )
-
-    # Opaque pixels look the same on both backgrounds; transparent do not.
-    alpha = 1.0 - (pixel_dist / bg_dist)
-    alpha = np.clip(alpha, 0.0, 1.0)
-
-    # Avoid division by zero while un-premultiplying color.
-    alpha_safe = np.where(alpha > 0.01, alpha, 1.0)
-
-    # Recover foreground color from image on black background.
-    r_out = img_black[:, :, 0] / alpha_safe
-    g_out = img_black[:, :, 1] / alpha_safe
-    b_out = img_black[:, :, 2] / alpha_safe
-
-    # Zero color in near-fully transparent pixels.
-    r_out = np.where(alpha > 0.01, r_out, 0)
-    g_out = np.where(alpha > 0.01, g_out, 0)
-    b_out = np.where(alpha > 0.01, b_out, 0)
-
-    # Clamp and convert to uint8
-    r_out = np.clip(np.round(r_out), 0, 255).astype(np.uint8)
-    g_out = np.clip(np.round(g_out), 0, 255).astype(np.uint8)
-    b_out = np.clip(np.round(b_out), 0, 255).astype(np.uint8)
-    a_out = np.clip(np.round(alpha * 255), 0, 255).astype(np.uint8)
-
-    # Stack into RGBA and save
-    output = np.stack([r_out, g_out, b_out, a_out], axis=2)
     Image.fromarray(output, mode="RGBA").save(output_path, "PNG")
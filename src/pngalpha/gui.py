@@ -4,10 +4,15 @@ Drag-and-drop GUI for pngalpha.
 
 from __future__ import annotations
 
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import os
 from pathlib import Path
 import subprocess
 import sys
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
@@ -66,6 +71,35 @@ COLORS = {
     "output_fg": "#2b3642",
 }
 
+# Bounding box for drop-box preview thumbnails.
+PREVIEW_SIZE = (360, 220)
+PREVIEW_CACHE_SIZE = 8
+
+# Polling interval while a conversion runs in the worker process.
+CONVERSION_POLL_MS = 50
+
+_conversion_pool: ProcessPoolExecutor | None = None
+
+
+def _get_conversion_pool() -> ProcessPoolExecutor:
+    """Return the shared single-worker process pool, creating it on first use."""
+    global _conversion_pool
+    if _conversion_pool is None:
+        # spawn, not fork: forking after Numba has started its thread pool
+        # can deadlock, and spawn is already the default on Windows/macOS.
+        _conversion_pool = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _conversion_pool
+
+
+def _shutdown_conversion_pool() -> None:
+    global _conversion_pool
+    if _conversion_pool is not None:
+        _conversion_pool.shutdown(wait=False, cancel_futures=True)
+        _conversion_pool = None
+
 
 class DropBox:
     """Visual state holder for a drop target."""
@@ -75,6 +109,7 @@ class DropBox:
         self.button = button
         self.placeholder_text = placeholder_text
         self.preview_image: ImageTk.PhotoImage | None = None
+        self.preview_request = 0
         self.has_path = False
         self.hovered = False
 
@@ -93,6 +128,9 @@ class PngAlphaGui(BaseTk):
         self.black_path: Path | None = None
         self.last_output_path: Path | None = None
         self.is_processing = False
+        self.converting_inputs: tuple[Path, Path] | None = None
+        # Recent previews keyed by (path, mtime_ns), least recently used first.
+        self._preview_cache: OrderedDict[tuple[str, int], ImageTk.PhotoImage] = OrderedDict()
 
         self.output_var = tk.StringVar(value="-")
         self.status_var = tk.StringVar(value="")
@@ -418,12 +456,61 @@ class PngAlphaGui(BaseTk):
         )
 
     def _set_drop_box_preview(self, drop_box: DropBox, path: Path) -> None:
+        # Decode and thumbnail off the Tk thread; only the PhotoImage is
+        # created back on the UI thread. Newer requests supersede older ones.
+        drop_box.preview_request += 1
+        request = drop_box.preview_request
+
         try:
-            with Image.open(path) as img:
-                preview = img.convert("RGBA")
-                preview.thumbnail((360, 220), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(preview)
-        except Exception:
+            cache_key: tuple[str, int] | None = (str(path), path.stat().st_mtime_ns)
+        except OSError:
+            cache_key = None
+        cached = self._preview_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            self._preview_cache.move_to_end(cache_key)
+            drop_box.preview_image = cached
+            drop_box.target.configure(image=cached, text="", compound="center")
+            return
+
+        drop_box.preview_image = None
+        drop_box.target.configure(image="", text="Loading preview...", compound="center")
+
+        def decode() -> None:
+            try:
+                with Image.open(path) as img:
+                    # JPEG only: let libjpeg downscale during decode. 2x the
+                    # box so LANCZOS still has detail to work with.
+                    img.draft("RGB", (PREVIEW_SIZE[0] * 2, PREVIEW_SIZE[1] * 2))
+                    # Decode now: an RGBA image is used as-is and must not
+                    # depend on the file handle closed by the with block.
+                    img.load()
+                    preview = img if img.mode == "RGBA" else img.convert("RGBA")
+                    preview.thumbnail(PREVIEW_SIZE, Image.Resampling.LANCZOS)
+            except Exception:
+                preview = None
+            try:
+                self.after(0, self._apply_drop_box_preview, drop_box, request, cache_key, preview)
+            except (RuntimeError, tk.TclError):
+                pass  # Window closed while decoding.
+
+        threading.Thread(target=decode, daemon=True).start()
+
+    def _apply_drop_box_preview(
+        self,
+        drop_box: DropBox,
+        request: int,
+        cache_key: tuple[str, int] | None,
+        preview: Image.Image | None,
+    ) -> None:
+        if request != drop_box.preview_request:
+            return
+        photo = None
+        if preview is not None:
+            try:
+                photo = ImageTk.PhotoImage(preview)
+            except Exception:
+                photo = None
+        if photo is None:
             drop_box.preview_image = None
             drop_box.target.configure(
                 image="",
@@ -432,10 +519,16 @@ class PngAlphaGui(BaseTk):
             )
             return
 
+        if cache_key is not None:
+            self._preview_cache[cache_key] = photo
+            while len(self._preview_cache) > PREVIEW_CACHE_SIZE:
+                self._preview_cache.popitem(last=False)
+
         drop_box.preview_image = photo
         drop_box.target.configure(image=photo, text="", compound="center")
 
     def _clear_drop_box_preview(self, drop_box: DropBox) -> None:
+        drop_box.preview_request += 1
         drop_box.preview_image = None
         drop_box.target.configure(image="", text=drop_box.placeholder_text, compound="center")
 
@@ -591,24 +684,47 @@ class PngAlphaGui(BaseTk):
         self._set_open_output_button_state(False)
         self._set_input_buttons_enabled(False)
         self._set_status("Processing...", "running")
-        self.update_idletasks()
 
+        # Convert in a worker process so the Tk event loop stays responsive.
         self.is_processing = True
+        self.converting_inputs = (self.white_path, self.black_path)
         try:
-            extract_alpha_two_pass(
+            future = _get_conversion_pool().submit(
+                extract_alpha_two_pass,
                 str(self.white_path),
                 str(self.black_path),
                 str(output_path),
             )
         except Exception as exc:
+            self._finish_conversion(output_path, exc)
+            return
+        self.after(CONVERSION_POLL_MS, self._check_conversion, future, output_path)
+
+    def _check_conversion(self, future: Future, output_path: Path) -> None:
+        if not future.done():
+            self.after(CONVERSION_POLL_MS, self._check_conversion, future, output_path)
+            return
+        self._finish_conversion(output_path, future.exception())
+
+    def _finish_conversion(self, output_path: Path, exc: BaseException | None) -> None:
+        if isinstance(exc, BrokenProcessPool):
+            # The worker died; start a fresh one for the next conversion.
+            _shutdown_conversion_pool()
+        inputs_changed = self.converting_inputs != (self.white_path, self.black_path)
+        if inputs_changed:
+            # Inputs were replaced or reset while converting; drop this result.
+            pass
+        elif exc is not None:
             self._set_status("Conversion failed.", "error")
             messagebox.showerror("Conversion failed", str(exc))
         else:
             self._set_status(f"Done: {output_path.name}", "ok")
             self._set_open_output_button_state(True)
-        finally:
-            self._set_input_buttons_enabled(True)
-            self.is_processing = False
+        self._set_input_buttons_enabled(True)
+        self.is_processing = False
+        self.converting_inputs = None
+        if inputs_changed:
+            self._auto_convert_if_ready()
 
     @staticmethod
     def _suggest_output_path(white_path: Path) -> Path:
@@ -640,7 +756,10 @@ class PngAlphaGui(BaseTk):
 def main() -> int:
     """GUI entry point."""
     app = PngAlphaGui()
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        _shutdown_conversion_pool()
     return 0
 
 